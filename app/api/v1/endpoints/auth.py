@@ -24,6 +24,8 @@ from app.core.deps import (
     get_current_user_info,
     get_current_user_optional,
     get_db,
+    json_body_openapi,
+    parse_json_body,
 )
 from app.core.jwt import (
     create_access_token,
@@ -32,10 +34,12 @@ from app.core.jwt import (
     TokenError,
 )
 from app.core.security import verify_password
+from app.core.ip_ban_cache import ip_ban_cache
 from app.core.rbac import get_user_permissions, get_user_roles
 from app.core.security_config import security_settings
 from app.core.rate_limiter import rate_limiter
 from app.core.threat_detection import threat_detector
+from app.core.user_cache import user_auth_cache
 from app.db.models.user import User
 from app.db.models.token import RefreshToken
 from app.db.models.audit import AuthEvent
@@ -47,6 +51,7 @@ from app.schemas.auth import (
     RefreshResponse,
     CurrentUser,
     ValidateResponse,
+    login_request_adapter,
 )
 
 router = APIRouter(prefix="/auth", tags=["认证"])
@@ -66,7 +71,7 @@ def get_client_ip(request: Request) -> str:
     # 优先从代理头获取
     forwarded_for = request.headers.get("X-Forwarded-For")
     if forwarded_for:
-        return forwarded_for.split(",")[0].strip()
+        return forwarded_for.partition(",")[0].strip()
 
     real_ip = request.headers.get("X-Real-IP")
     if real_ip:
@@ -227,9 +232,13 @@ async def handle_login_failure(
     await db.commit()
 
     # 执行威胁检测
-    await threat_detector.check_and_respond(client_ip, db)
+    threat = await threat_detector.check_and_respond(client_ip, db)
     await db.commit()
 
+    # 检测到威胁时可能已自动封禁，使封禁状态缓存失效
+    if threat:
+        ip_ban_cache.invalidate()
+
 
 def get_cookie_secure() -> bool:
     """
@@ -246,11 +255,16 @@ def get_cookie_secure() -> bool:
     return False
 
 
-@router.post("/login", response_model=LoginResponse, summary="用户登录")
+@router.post(
+    "/login",
+    response_model=LoginResponse,
+    summary="用户登录",
+    # 请求体在函数内解析，这里补充 OpenAPI 文档
+    openapi_extra=json_body_openapi(LoginRequest),
+)
 async def login(
     request: Request,
     response: Response,
-    data: LoginRequest,
     db: Annotated[AsyncSession, Depends(get_db)],
 ):
     """
@@ -263,7 +277,10 @@ async def login(
     - 账户锁定机制（连续失败后自动锁定）
     - 威胁检测（自动封禁可疑 IP）
     """
+    data = await parse_json_body(request, login_request_adapter)
+
     client_ip = get_client_ip(request)
+    user_agent = request.headers.get("user-agent")
 
     # 1. 检查登录速率限制
     await check_login_rate_limit(request, data.username)
@@ -319,7 +336,7 @@ async def login(
         expires_at=datetime.now(timezone.utc)
         + timedelta(days=settings.jwt_refresh_token_expire_days),
         ip=client_ip,
-        user_agent=request.headers.get("user-agent"),
+        user_agent=user_agent,
     )
     db.add(refresh_token_record)
 
@@ -332,7 +349,7 @@ async def login(
         principal_type="user",
         principal_id=user.id,
         ip=client_ip,
-        user_agent=request.headers.get("user-agent"),
+        user_agent=user_agent,
         result="success",
     )
     db.add(event)
@@ -369,6 +386,10 @@ async def refresh_token(
 
     使用刷新令牌获取新的访问令牌和刷新令牌（令牌轮换）
     """
+    # 客户端信息（供令牌记录和审计事件复用），IP 由安全中间件解析
+    client_host = request.state.client_ip
+    user_agent = request.headers.get("user-agent")
+
     try:
         # 解码刷新令牌
         payload = decode_token(data.refresh_token)
@@ -445,8 +466,8 @@ async def refresh_token(
             jti=new_jti,
             expires_at=datetime.now(timezone.utc)
             + timedelta(days=settings.jwt_refresh_token_expire_days),
-            ip=request.client.host if request.client else None,
-            user_agent=request.headers.get("user-agent"),
+            ip=client_host,
+            user_agent=user_agent,
         )
         db.add(new_token_record)
 
@@ -458,8 +479,8 @@ async def refresh_token(
             event_type="refresh",
             principal_type="user",
             principal_id=user.id,
-            ip=request.client.host if request.client else "unknown",
-            user_agent=request.headers.get("user-agent"),
+            ip=client_host,
+            user_agent=user_agent,
             result="success",
         )
         db.add(event)
@@ -547,6 +568,8 @@ async def logout(
 
         await db.commit()
 
+        user_auth_cache.invalidate(user_id)
+
     # 清除认证 Cookie
     response.delete_cookie(key="access_token", path="/")
 
@@ -611,9 +634,8 @@ async def validate_token(
 
         user_id = payload.get("sub")
 
-        # 查询用户，验证是否存在且未被禁用
-        result = await db.execute(select(User).where(User.id == user_id))
-        user = result.scalar_one_or_none()
+        # 查询用户状态（带短期缓存），验证是否存在且未被禁用
+        user = await user_auth_cache.get(db, user_id)
 
         if user is None:
             raise HTTPException(
@@ -5,7 +5,7 @@
 """
 
 from datetime import datetime, timedelta, timezone
-from typing import Annotated
+from typing import Annotated, Optional
 from uuid import uuid4
 
 from fastapi import APIRouter, Depends, HTTPException, Request, status
@@ -13,7 +13,7 @@ from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.core.config import settings
-from app.core.deps import get_db, require_permissions
+from app.core.deps import get_db, json_body_openapi, parse_json_body, require_permissions
 from app.core.jwt import create_access_token
 from app.core.security import hash_password, verify_password
 from app.db.models.user import User
@@ -27,6 +27,7 @@ from app.schemas.service import (
     ServiceCredentialResponse,
     S2STokenRequest,
     S2STokenResponse,
+    s2s_token_request_adapter,
 )
 
 router = APIRouter(prefix="/s2s", tags=["服务间认证"])
@@ -42,10 +43,46 @@ def generate_client_secret() -> str:
     return f"secret_{uuid4().hex}"
 
 
-@router.post("/token", response_model=S2STokenResponse, summary="获取服务令牌")
+def build_s2s_auth_event(
+    client_ip: str,
+    user_agent: Optional[str],
+    result: str,
+    principal_id: Optional[str] = None,
+    failure_reason: Optional[str] = None,
+) -> AuthEvent:
+    """
+    构建服务间认证审计事件
+
+    Args:
+        client_ip: 客户端 IP
+        user_agent: 客户端 User-Agent
+        result: 事件结果：success, failure
+        principal_id: 服务 ID（客户端ID不存在时为 None）
+        failure_reason: 失败原因
+
+    Returns:
+        未保存的认证事件对象
+    """
+    return AuthEvent(
+        event_type="s2s_auth",
+        principal_type="service",
+        principal_id=principal_id,
+        ip=client_ip,
+        user_agent=user_agent,
+        result=result,
+        failure_reason=failure_reason,
+    )
+
+
+@router.post(
+    "/token",
+    response_model=S2STokenResponse,
+    summary="获取服务令牌",
+    # 请求体在函数内解析，这里补充 OpenAPI 文档
+    openapi_extra=json_body_openapi(S2STokenRequest),
+)
 async def get_service_token(
     request: Request,
-    data: S2STokenRequest,
     db: Annotated[AsyncSession, Depends(get_db)],
 ):
     """
@@ -53,6 +90,12 @@ async def get_service_token(
 
     使用客户端ID和密钥获取服务访问令牌
     """
+    data = await parse_json_body(request, s2s_token_request_adapter)
+
+    # 客户端信息（供各审计事件复用），IP 由安全中间件解析
+    client_ip = request.state.client_ip
+    user_agent = request.headers.get("user-agent")
+
     # 查找凭证
     result = await db.execute(
         select(ServiceCredential).where(ServiceCredential.client_id == data.client_id)
@@ -61,15 +104,11 @@ async def get_service_token(
 
     if credential is None:
         # 记录失败事件
-        event = AuthEvent(
-            event_type="s2s_auth",
-            principal_type="service",
-            ip=request.client.host if request.client else "unknown",
-            user_agent=request.headers.get("user-agent"),
-            result="failure",
-            failure_reason="客户端ID不存在",
+        db.add(
+            build_s2s_auth_event(
+                client_ip, user_agent, "failure", failure_reason="客户端ID不存在"
+            )
         )
-        db.add(event)
         await db.commit()
 
         raise HTTPException(
@@ -86,16 +125,15 @@ async def get_service_token(
 
     # 验证密钥
     if not verify_password(data.client_secret, credential.secret_hash):
-        event = AuthEvent(
-            event_type="s2s_auth",
-            principal_type="service",
-            principal_id=credential.service_id,
-            ip=request.client.host if request.client else "unknown",
-            user_agent=request.headers.get("user-agent"),
-            result="failure",
-            failure_reason="密钥错误",
+        db.add(
+            build_s2s_auth_event(
+                client_ip,
+                user_agent,
+                "failure",
+                principal_id=credential.service_id,
+                failure_reason="密钥错误",
+            )
         )
-        db.add(event)
         await db.commit()
 
         raise HTTPException(
@@ -131,15 +169,11 @@ async def get_service_token(
     credential.last_used_at = datetime.now(timezone.utc)
 
     # 记录成功事件
-    event = AuthEvent(
-        event_type="s2s_auth",
-        principal_type="service",
-        principal_id=service.id,
-        ip=request.client.host if request.client else "unknown",
-        user_agent=request.headers.get("user-agent"),
-        result="success",
+    db.add(
+        build_s2s_auth_event(
+            client_ip, user_agent, "success", principal_id=service.id
+        )
     )
-    db.add(event)
 
     await db.commit()
 
@@ -19,7 +19,8 @@ from sqlalchemy import select, func, or_
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.core.deps import get_db, require_permissions
-from app.core.rate_limiter import rate_limiter
+from app.core.ip_ban_cache import ip_ban_cache
+from app.core.rate_limiter import get_rate_limit_stats
 from app.core.threat_detection import threat_detector
 from app.core.security_config import security_settings
 from app.db.models.user import User
@@ -258,6 +259,7 @@ async def create_ip_ban(
     db.add(event)
 
     await db.commit()
+    ip_ban_cache.invalidate()
     await db.refresh(record)
 
     return IPBanResponse(
@@ -329,6 +331,7 @@ async def delete_ip_ban(
     db.add(event)
 
     await db.commit()
+    ip_ban_cache.invalidate()
 
 
 @router.get(
@@ -412,7 +415,7 @@ async def get_security_stats(
     )
 
     # 速率限制统计
-    rate_limit_stats = await rate_limiter.get_stats()
+    rate_limit_stats = await get_rate_limit_stats()
 
     return SecurityStatsResponse(
         login_failures_24h=login_failures_24h.scalar() or 0,
@@ -441,6 +444,7 @@ async def get_security_config(
     return {
         "rate_limit": {
             "enabled": security_settings.rate_limit_enabled,
+            "global_algorithm": security_settings.rate_limit_global_algorithm,
             "login_max": security_settings.rate_limit_login_max,
             "login_window": security_settings.rate_limit_login_window,
             "global_max": security_settings.rate_limit_global_max,
@@ -14,6 +14,7 @@ from sqlalchemy.orm import selectinload
 from app.core.deps import get_db, get_current_user, require_permissions
 from app.core.security import hash_password
 from app.core.rbac import get_user_roles
+from app.core.user_cache import user_auth_cache
 from app.db.models.user import User
 from app.db.models.role import Role
 from app.db.models.user_role import UserRole
@@ -266,6 +267,7 @@ async def update_user(
                 db.add(user_role)
 
     await db.commit()
+    user_auth_cache.invalidate(user_id)
     await db.refresh(user)
 
     roles = await get_user_roles(db, user.id)
@@ -309,3 +311,4 @@ async def delete_user(
 
     await db.delete(user)
     await db.commit()
+    user_auth_cache.invalidate(user_id)
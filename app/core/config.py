@@ -43,6 +43,12 @@ class Settings(BaseSettings):
     debug: bool = False
     host: str = "127.0.0.1"
     port: int = 8000
+    # 工作进程数，大于 1 时需配置固定的 JWT 密钥，
+    # 且限流计数、封禁缓存等内存状态按进程各自维护
+    workers: int = 1
+    # 由 run.py 在多进程模式下为工作进程设置，工作进程跳过建表、
+    # 初始化数据和服务注册（这些步骤由主进程完成一次），无需手动配置
+    worker_process: bool = False
 
     # 数据库配置
     database_url: str = "sqlite+aiosqlite:///./aegis.db"
@@ -4,10 +4,13 @@ FastAPI 依赖注入模块
 提供认证、权限检查等通用依赖
 """
 
-from typing import Annotated, Optional
+import json
+from typing import Annotated, List, Optional, Type, TypeVar
 
 from fastapi import Depends, HTTPException, Request, status
+from fastapi.exceptions import RequestValidationError
 from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
+from pydantic import BaseModel, TypeAdapter, ValidationError
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
@@ -21,6 +24,11 @@ from app.schemas.auth import CurrentUser
 # HTTP Bearer 认证方案
 security = HTTPBearer(auto_error=False)
 
+T = TypeVar("T")
+
+# 由 parse_json_body 在函数内解析请求体的模型，生成 OpenAPI 时补充到 components/schemas
+json_body_models: List[Type[BaseModel]] = []
+
 
 async def get_current_user(
     request: Request,
@@ -195,3 +203,127 @@ async def get_current_user_info(
         roles=list(roles),
         permissions=list(permissions),
     )
+
+
+def json_body_openapi(model: Type[BaseModel]) -> dict:
+    """
+    为在函数内解析请求体的接口生成 openapi_extra
+
+    请求体以 $ref 引用模型，模型登记到 json_body_models，
+    由 app.main 补充到 components/schemas；同时补充 422 响应，
+    与声明为参数时的文档一致
+
+    Args:
+        model: 请求体模型
+
+    Returns:
+        路由的 openapi_extra
+    """
+    json_body_models.append(model)
+    return {
+        "requestBody": {
+            "content": {
+                "application/json": {
+                    "schema": {"$ref": f"#/components/schemas/{model.__name__}"}
+                }
+            },
+            "required": True,
+        },
+        "responses": {
+            "422": {
+                "description": "Validation Error",
+                "content": {
+                    "application/json": {
+                        "schema": {"$ref": "#/components/schemas/HTTPValidationError"}
+                    }
+                },
+            }
+        },
+    }
+
+
+def is_json_content_type(content_type: Optional[str]) -> bool:
+    """
+    判断 Content-Type 是否为 JSON（application/json 或 application/*+json）
+
+    与 FastAPI 一致：缺少 Content-Type 或其他类型都不按 JSON 解析，
+    text/plain、表单等跨站"简单请求"无法借此绕过 CORS 预检提交 JSON
+    """
+    if not content_type:
+        return False
+
+    main_type, _, subtype = content_type.partition(";")[0].strip().lower().partition("/")
+    return main_type == "application" and (subtype == "json" or subtype.endswith("+json"))
+
+
+async def parse_json_body(request: Request, adapter: TypeAdapter[T]) -> T:
+    """
+    使用预构建的 TypeAdapter 解析 JSON 请求体
+
+    供高频接口使用：请求体字节直接交给 pydantic-core 解析和校验，
+    跳过 FastAPI 的请求体解析流程。错误类型和 loc 与 FastAPI 一致：
+    空请求体返回 missing，Content-Type 不是 JSON 时返回 model_attributes_type，
+    JSON 格式错误返回 json_invalid，校验错误的 loc 加上 "body" 前缀。
+    前两种错误的 input 不回显原始请求体（可能包含密码等敏感字段）。
+
+    Args:
+        request: FastAPI 请求对象
+        adapter: 请求模型的 TypeAdapter
+
+    Returns:
+        校验后的请求模型
+
+    Raises:
+        RequestValidationError: 请求体为空、不是 JSON、不是合法 JSON 或校验失败
+    """
+    body = await request.body()
+    if not body:
+        raise RequestValidationError(
+            [{"type": "missing", "loc": ("body",), "msg": "Field required", "input": None}]
+        )
+
+    if not is_json_content_type(request.headers.get("content-type")):
+        raise RequestValidationError(
+            [
+                {
+                    "type": "model_attributes_type",
+                    "loc": ("body",),
+                    "msg": "Input should be a valid dictionary or object to extract fields from",
+                    "input": {},
+                }
+            ]
+        )
+
+    try:
+        return adapter.validate_json(body)
+    except ValidationError as e:
+        errors = e.errors(include_url=False)
+        if errors and errors[0]["type"] == "json_invalid":
+            # 原始请求体可能包含密码等敏感字段，不能出现在错误响应中
+            raise RequestValidationError([_json_decode_error(body)])
+        raise RequestValidationError(
+            [{**error, "loc": ("body", *error["loc"])} for error in errors]
+        )
+
+
+def _json_decode_error(body: bytes) -> dict:
+    """
+    构造与 FastAPI 一致的 JSON 解析错误
+
+    pydantic 的错误中不含出错位置，仅在出错时用标准库重新解析一次获取
+    """
+    try:
+        json.loads(body)
+    except ValueError as e:
+        pos = e.pos if isinstance(e, json.JSONDecodeError) else 0
+        message = e.msg if isinstance(e, json.JSONDecodeError) else str(e)
+    else:
+        pos, message = 0, "Invalid JSON"
+
+    return {
+        "type": "json_invalid",
+        "loc": ("body", pos),
+        "msg": "JSON decode error",
+        "input": {},
+        "ctx": {"error": message},
+    }
@@ -0,0 +1,149 @@
+"""
+IP 封禁状态缓存模块
+
+在内存中保存当前所有生效封禁的快照，IP 过滤中间件直接查字典，
+正常请求不再查询封禁表。
+
+特点：
+- 快照只包含生效中的封禁记录，数量通常很少
+- 本实例封禁/解封 IP 时递增版本号，下一个请求即重新加载快照
+- 定期重新加载，其他实例上的变更最多延迟刷新间隔秒生效
+- 封禁到期时间在查找时判断，到期自动解封，无需等待刷新
+"""
+
+import logging
+import time
+from asyncio import Lock
+from datetime import datetime, timezone
+from typing import Dict, Optional, Tuple
+
+from sqlalchemy import select
+
+from app.db.models.ip_ban import IPBanRecord
+from app.db.session import async_session_maker
+
+logger = logging.getLogger(__name__)
+
+# 封禁记录时间均按 UTC 存储
+UTC = timezone.utc
+
+
+class IPBanCache:
+    """
+    IP 封禁状态缓存
+
+    使用示例：
+        is_banned, reason = await ip_ban_cache.check(ip)
+
+        # 封禁或解封 IP 并提交后，通知缓存重新加载
+        ip_ban_cache.invalidate()
+    """
+
+    def __init__(self, refresh_interval_seconds: float = 10):
+        """
+        初始化缓存
+
+        Args:
+            refresh_interval_seconds: 定期重新加载快照的间隔（秒）
+        """
+        # 快照结构: {ip: (封禁原因, 过期时间戳)}，过期时间戳为 None 表示永久封禁
+        self._bans: Dict[str, Tuple[str, Optional[float]]] = {}
+        self._refresh_interval = refresh_interval_seconds
+        # 下次定期刷新的时间（单调时钟），0 表示尚未加载
+        self._next_refresh = 0.0
+        # 封禁变更版本号，与已加载的版本号不一致时重新加载
+        self._version = 0
+        self._loaded_version = 0
+        # 避免并发请求同时重新加载
+        self._lock = Lock()
+
+    async def check(self, ip: str) -> Tuple[bool, str]:
+        """
+        检查 IP 是否被封禁
+
+        Args:
+            ip: 要检查的 IP
+
+        Returns:
+            (是否被封禁, 封禁原因)
+        """
+        if self._is_stale():
+            async with self._lock:
+                if self._is_stale():
+                    await self._reload()
+
+        ban = self._bans.get(ip)
+        if ban is None:
+            return False, ""
+
+        reason, expires_ts = ban
+        if expires_ts is not None and expires_ts <= time.time():
+            return False, ""
+
+        return True, reason
+
+    def invalidate(self) -> None:
+        """
+        标记封禁数据已变更，下一次检查时重新加载快照
+        """
+        self._version += 1
+
+    def _is_stale(self) -> bool:
+        """快照是否需要重新加载"""
+        return (
+            self._loaded_version != self._version
+            or time.monotonic() >= self._next_refresh
+        )
+
+    async def _reload(self) -> None:
+        """
+        从数据库重新加载所有生效的封禁记录
+
+        加载失败时保留旧快照，等到下一个刷新间隔再重试
+        """
+        # 先记下版本号，加载期间发生的变更会在下次检查时再次加载
+        version = self._version
+        self._next_refresh = time.monotonic() + self._refresh_interval
+
+        try:
+            async with async_session_maker() as db:
+                now = datetime.now(UTC)
+                result = await db.execute(
+                    select(
+                        IPBanRecord.ip, IPBanRecord.reason, IPBanRecord.expires_at
+                    ).where(
+                        IPBanRecord.unbanned_at.is_(None),
+                        (IPBanRecord.expires_at.is_(None)) | (IPBanRecord.expires_at > now),
+                    )
+                )
+                rows = result.all()
+        except Exception as e:
+            # 数据库查询失败不应阻止正常请求
+            # 只记录日志，继续使用旧快照
+            logger.warning(f"加载 IP 封禁列表失败: {e}")
+            self._loaded_version = version
+            return
+
+        bans: Dict[str, Tuple[str, Optional[float]]] = {}
+        for ip, reason, expires_at in rows:
+            expires_ts = None
+            if expires_at is not None:
+                # SQLite 读出的时间不带时区，按 UTC 处理
+                if expires_at.tzinfo is None:
+                    expires_at = expires_at.replace(tzinfo=UTC)
+                expires_ts = expires_at.timestamp()
+
+            # 同一 IP 有多条生效记录时，保留到期最晚的一条
+            existing = bans.get(ip)
+            if existing is not None and (
+                existing[1] is None or (expires_ts is not None and expires_ts <= existing[1])
+            ):
+                continue
+            bans[ip] = (reason, expires_ts)
+
+        self._bans = bans
+        self._loaded_version = version
+
+
+# 全局 IP 封禁状态缓存单例
+ip_ban_cache = IPBanCache()
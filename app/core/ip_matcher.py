@@ -0,0 +1,117 @@
+"""
+IP 匹配模块
+
+判断 IP 是否命中 IP 列表，支持单个 IP 和 CIDR 网段（如 192.168.1.0/24）。
+
+实现方式：
+- 单个 IP 直接放入字符串集合，精确匹配只需一次集合查找
+- CIDR 网段按前缀长度分组，每组保存网络号集合
+- 查找时对每个出现过的前缀长度做一次掩码 + 集合查找，
+  耗时只与不同前缀长度的数量有关，与列表大小无关
+"""
+
+import ipaddress
+import logging
+from typing import Dict, Iterable, List, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class IPMatcher:
+    """
+    IP 列表匹配器
+
+    使用示例：
+        blacklist = IPMatcher(["10.0.0.1", "192.168.0.0/16", "2001:db8::/32"])
+
+        if "192.168.1.100" in blacklist:
+            ...
+    """
+
+    def __init__(self, entries: Iterable[str]):
+        """
+        初始化匹配器
+
+        Args:
+            entries: IP 或 CIDR 字符串列表，无效条目会被忽略并记录警告
+        """
+        # 精确匹配的 IP 字符串集合
+        self._exact: Set[str] = set()
+        # 网段: {IP 版本: {前缀长度: 网络号集合}}
+        self._networks: Dict[int, Dict[int, Set[int]]] = {4: {}, 6: {}}
+
+        for entry in entries:
+            self._add(entry.strip())
+
+        # 按前缀长度从长到短排列，便于查找
+        self._prefixes: Dict[int, List[Tuple[int, Set[int]]]] = {
+            version: [
+                (max_bits - prefix_len, by_prefix[prefix_len])
+                for prefix_len in sorted(by_prefix, reverse=True)
+            ]
+            for version, max_bits, by_prefix in (
+                (4, 32, self._networks[4]),
+                (6, 128, self._networks[6]),
+            )
+        }
+        self._has_networks = any(self._prefixes.values())
+        # IPv6 地址有多种书写形式（大小写、零压缩），未命中时需规范化后再比较
+        self._has_exact_v6 = any(":" in ip for ip in self._exact)
+
+    def _add(self, entry: str) -> None:
+        """
+        添加一个 IP 或 CIDR 条目
+
+        Args:
+            entry: IP 或 CIDR 字符串
+        """
+        try:
+            network = ipaddress.ip_network(entry, strict=False)
+        except ValueError:
+            logger.warning(f"忽略无效的 IP 列表条目: {entry!r}")
+            return
+
+        if network.num_addresses == 1:
+            self._exact.add(str(network.network_address))
+            return
+
+        host_bits = network.max_prefixlen - network.prefixlen
+        self._networks[network.version].setdefault(network.prefixlen, set()).add(
+            int(network.network_address) >> host_bits
+        )
+
+    def __contains__(self, ip: str) -> bool:
+        """
+        检查 IP 是否命中列表
+
+        Args:
+            ip: 要检查的 IP 字符串
+
+        Returns:
+            True 如果 IP 等于某个条目或落在某个网段内
+        """
+        if ip in self._exact:
+            return True
+
+        if not self._has_networks and not (self._has_exact_v6 and ":" in ip):
+            return False
+
+        try:
+            address = ipaddress.ip_address(ip)
+        except ValueError:
+            return False
+
+        if address.version == 6 and str(address) in self._exact:
+            return True
+
+        value = int(address)
+        for host_bits, network_ids in self._prefixes[address.version]:
+            if value >> host_bits in network_ids:
+                return True
+
+        return False
+
+    def __len__(self) -> int:
+        return len(self._exact) + sum(
+            len(ids) for by_prefix in self._networks.values() for ids in by_prefix.values()
+        )
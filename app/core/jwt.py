@@ -2,8 +2,13 @@
 JWT 令牌处理模块
 
 提供 JWT 令牌的创建、验证和解析功能
+
+已验证的令牌会在进程内短暂缓存，同一令牌的重复请求无需重复验签。
+缓存只影响签名校验，用户状态和 token_version 仍由调用方按数据库校验。
 """
 
+import time
+from collections import OrderedDict
 from datetime import datetime, timedelta, timezone
 from typing import Any, Optional
 from uuid import uuid4
@@ -12,6 +17,13 @@ from jose import JWTError, jwt
 
 from app.core.config import settings
 
+# 解码缓存配置
+_DECODE_CACHE_MAX_SIZE = 10000
+_DECODE_CACHE_TTL = 30  # 秒
+
+# 解码缓存: {token: (缓存失效时间戳, payload)}，按最近使用顺序排列
+_decode_cache: "OrderedDict[str, tuple[float, dict[str, Any]]]" = OrderedDict()
+
 
 class TokenError(Exception):
     """令牌错误基类"""
@@ -115,24 +127,45 @@ def decode_token(token: str) -> dict[str, Any]:
         token: JWT 字符串
 
     Returns:
-        解码后的 payload 字典
+        解码后的 payload 字典（可能来自缓存，调用方不应修改）
 
     Raises:
         TokenExpiredError: 令牌已过期
         TokenInvalidError: 令牌无效
     """
+    now = time.time()
+
+    # 命中缓存且未失效时直接返回，跳过签名校验
+    cached = _decode_cache.get(token)
+    if cached is not None:
+        if cached[0] > now:
+            _decode_cache.move_to_end(token)
+            return cached[1]
+        del _decode_cache[token]
+
     try:
         payload = jwt.decode(
             token,
             settings.jwt_secret_key,
             algorithms=[settings.jwt_algorithm],
         )
-        return payload
     except jwt.ExpiredSignatureError:
         raise TokenExpiredError("令牌已过期")
     except JWTError as e:
         raise TokenInvalidError(f"令牌无效: {str(e)}")
 
+    # 缓存时间不超过令牌本身的过期时间
+    cache_until = now + _DECODE_CACHE_TTL
+    exp = payload.get("exp")
+    if isinstance(exp, (int, float)):
+        cache_until = min(cache_until, exp)
+
+    if len(_decode_cache) >= _DECODE_CACHE_MAX_SIZE:
+        _decode_cache.popitem(last=False)
+    _decode_cache[token] = (cache_until, payload)
+
+    return payload
+
 
 def get_token_subject(token: str) -> str:
     """
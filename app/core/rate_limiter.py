@@ -1,20 +1,29 @@
 """
 速率限制器模块
 
-使用滑动窗口算法的内存缓存实现。
+使用滑动窗口和固定窗口算法的内存缓存实现。
 适用于单实例部署，如需多实例部署可扩展为 Redis 实现。
 
+- SlidingWindowRateLimiter: 精确，每个 key 保存窗口内全部请求时间戳，
+  用于登录等需要防止边界突发的场景
+- FixedWindowRateLimiter: 每个 key 只保存窗口结束时间和计数，
+  单次检查 O(1)，用于高频、精度要求不高的全局限制
+
 特点：
-- 异步安全（使用 asyncio.Lock）
+- 检查、计数、记录在一步内完成，中间没有 await，
+  在事件循环中天然原子，无需加锁
 - 自动清理过期数据
 - 支持多种限制规则
 - 低内存占用
 """
 
-from asyncio import Lock
-from datetime import datetime, timedelta
-from typing import Dict, List, Tuple
+from collections import deque
+from datetime import datetime
+from typing import Deque, Dict, List, Tuple, Union
 import logging
+import time
+
+from app.core.security_config import security_settings
 
 logger = logging.getLogger(__name__)
 
@@ -47,14 +56,14 @@ class SlidingWindowRateLimiter:
         Args:
             cleanup_interval_minutes: 清理过期数据的间隔（分钟）
         """
-        # 缓存结构: {key: [timestamp1, timestamp2, ...]}
-        self._cache: Dict[str, List[datetime]] = {}
-        # 异步锁，确保线程安全
-        self._lock = Lock()
+        # 缓存结构: {key: deque([timestamp1, timestamp2, ...])}
+        # 时间戳使用单调时钟，按时间先后追加，队首即最早的记录
+        self._cache: Dict[str, Deque[float]] = {}
         # 最后清理时间
         self._last_cleanup = datetime.now()
-        # 清理间隔
-        self._cleanup_interval = timedelta(minutes=cleanup_interval_minutes)
+        self._last_cleanup_ts = time.monotonic()
+        # 清理间隔（秒）
+        self._cleanup_interval = cleanup_interval_minutes * 60
 
     async def is_allowed(
         self,
@@ -73,44 +82,40 @@ class SlidingWindowRateLimiter:
         Returns:
             元组 (是否允许, 剩余请求数, 重置时间秒数)
         """
-        async with self._lock:
-            now = datetime.now()
-            window_start = now - timedelta(seconds=window_seconds)
-
-            # 定期清理过期数据
-            if now - self._last_cleanup > self._cleanup_interval:
-                await self._cleanup_expired(window_start)
-                self._last_cleanup = now
-
-            # 获取或初始化该 key 的记录
-            if key not in self._cache:
-                self._cache[key] = []
-
-            # 清理该 key 的过期记录（窗口外的时间戳）
-            self._cache[key] = [
-                ts for ts in self._cache[key] if ts > window_start
-            ]
-
-            current_count = len(self._cache[key])
-            remaining = max(0, max_requests - current_count)
-
-            # 计算重置时间（最早记录过期的时间）
-            if self._cache[key]:
-                oldest = min(self._cache[key])
-                reset_seconds = max(
-                    0,
-                    int((oldest + timedelta(seconds=window_seconds) - now).total_seconds())
-                )
-            else:
-                reset_seconds = window_seconds
-
-            # 检查是否超过限制
-            if current_count >= max_requests:
-                return False, 0, reset_seconds
-
-            # 记录本次请求时间戳
-            self._cache[key].append(now)
-            return True, remaining - 1, reset_seconds
+        now = time.monotonic()
+        window_start = now - window_seconds
+
+        # 定期清理过期数据
+        if now - self._last_cleanup_ts > self._cleanup_interval:
+            self._cleanup_expired(window_start)
+            self._last_cleanup = datetime.now()
+            self._last_cleanup_ts = now
+
+        # 获取或初始化该 key 的记录
+        timestamps = self._cache.get(key)
+        if timestamps is None:
+            timestamps = self._cache[key] = deque()
+
+        # 从队首弹出过期记录（窗口外的时间戳），只处理过期的部分
+        while timestamps and timestamps[0] <= window_start:
+            timestamps.popleft()
+
+        current_count = len(timestamps)
+        remaining = max(0, max_requests - current_count)
+
+        # 计算重置时间（最早记录过期的时间）
+        if timestamps:
+            reset_seconds = max(0, int(timestamps[0] + window_seconds - now))
+        else:
+            reset_seconds = window_seconds
+
+        # 检查是否超过限制
+        if current_count >= max_requests:
+            return False, 0, reset_seconds
+
+        # 记录本次请求时间戳
+        timestamps.append(now)
+        return True, remaining - 1, reset_seconds
 
     async def get_count(self, key: str, window_seconds: int) -> int:
         """
@@ -123,14 +128,13 @@ class SlidingWindowRateLimiter:
         Returns:
             当前窗口内的请求数
         """
-        async with self._lock:
-            now = datetime.now()
-            window_start = now - timedelta(seconds=window_seconds)
+        window_start = time.monotonic() - window_seconds
 
-            if key not in self._cache:
-                return 0
+        timestamps = self._cache.get(key)
+        if not timestamps:
+            return 0
 
-            return len([ts for ts in self._cache[key] if ts > window_start])
+        return sum(1 for ts in timestamps if ts > window_start)
 
     async def reset(self, key: str) -> bool:
         """
@@ -142,11 +146,7 @@ class SlidingWindowRateLimiter:
         Returns:
             是否成功重置（key 存在则为 True）
         """
-        async with self._lock:
-            if key in self._cache:
-                del self._cache[key]
-                return True
-            return False
+        return self._cache.pop(key, None) is not None
 
     async def reset_pattern(self, pattern: str) -> int:
         """
@@ -158,29 +158,27 @@ class SlidingWindowRateLimiter:
         Returns:
             重置的 key 数量
         """
-        async with self._lock:
-            keys_to_delete = [
-                key for key in self._cache.keys() if key.startswith(pattern)
-            ]
-            for key in keys_to_delete:
-                del self._cache[key]
-            return len(keys_to_delete)
+        keys_to_delete = [
+            key for key in self._cache.keys() if key.startswith(pattern)
+        ]
+        for key in keys_to_delete:
+            del self._cache[key]
+        return len(keys_to_delete)
 
-    async def _cleanup_expired(self, cutoff: datetime) -> None:
+    def _cleanup_expired(self, cutoff: float) -> None:
         """
         清理所有过期记录
 
         Args:
-            cutoff: 截止时间，早于此时间的记录将被清理
+            cutoff: 截止时间（单调时钟），早于此时间的记录将被清理
         """
         keys_to_delete = []
 
         for key, timestamps in self._cache.items():
-            # 过滤出有效的时间戳
-            valid = [ts for ts in timestamps if ts > cutoff]
-            if valid:
-                self._cache[key] = valid
-            else:
+            # 弹出过期的时间戳
+            while timestamps and timestamps[0] <= cutoff:
+                timestamps.popleft()
+            if not timestamps:
                 keys_to_delete.append(key)
 
         # 删除空记录
@@ -197,23 +195,185 @@ class SlidingWindowRateLimiter:
         Returns:
             包含统计信息的字典
         """
-        async with self._lock:
-            total_keys = len(self._cache)
-            total_records = sum(len(v) for v in self._cache.values())
+        total_keys = len(self._cache)
+        total_records = sum(len(v) for v in self._cache.values())
+
+        # 按前缀分组统计
+        prefix_stats = {}
+        for key in self._cache.keys():
+            prefix = key.split(":")[0] if ":" in key else key
+            prefix_stats[prefix] = prefix_stats.get(prefix, 0) + 1
+
+        return {
+            "total_keys": total_keys,
+            "total_records": total_records,
+            "prefix_stats": prefix_stats,
+            "last_cleanup": self._last_cleanup.isoformat(),
+        }
+
+
+class FixedWindowRateLimiter:
+    """
+    固定窗口速率限制器
+
+    每个 key 从第一次请求开始计时，窗口内只累加计数，窗口结束后重新计数。
+    窗口边界处最多可能放行 2 倍请求，换来每次检查 O(1) 的开销和极小的内存占用。
+
+    使用示例：
+        limiter = FixedWindowRateLimiter()
+
+        allowed, remaining, reset = await limiter.is_allowed(
+            key="global:192.168.1.1",
+            max_requests=100,
+            window_seconds=60
+        )
+    """
+
+    def __init__(self, cleanup_interval_minutes: int = 5):
+        """
+        初始化速率限制器
+
+        Args:
+            cleanup_interval_minutes: 清理过期数据的间隔（分钟）
+        """
+        # 缓存结构: {key: [窗口结束时间, 窗口内请求数]}
+        self._cache: Dict[str, List[float]] = {}
+        # 最后清理时间
+        self._last_cleanup = datetime.now()
+        self._last_cleanup_ts = time.monotonic()
+        # 清理间隔（秒）
+        self._cleanup_interval = cleanup_interval_minutes * 60
+
+    async def is_allowed(
+        self,
+        key: str,
+        max_requests: int,
+        window_seconds: int,
+    ) -> Tuple[bool, int, int]:
+        """
+        检查是否允许请求
+
+        Args:
+            key: 限制键（如 "global:192.168.1.1"）
+            max_requests: 时间窗口内最大请求数
+            window_seconds: 时间窗口长度（秒）
+
+        Returns:
+            元组 (是否允许, 剩余请求数, 重置时间秒数)
+        """
+        now = time.monotonic()
+
+        # 定期清理过期数据
+        if now - self._last_cleanup_ts > self._cleanup_interval:
+            self._cleanup_expired(now)
+            self._last_cleanup = datetime.now()
+            self._last_cleanup_ts = now
+
+        # 窗口不存在或已结束时开启新窗口
+        window = self._cache.get(key)
+        if window is None or window[0] <= now:
+            window = self._cache[key] = [now + window_seconds, 0]
+
+        reset_seconds = max(0, int(window[0] - now))
+
+        # 检查是否超过限制
+        if window[1] >= max_requests:
+            return False, 0, reset_seconds
+
+        window[1] += 1
+        return True, max_requests - int(window[1]), reset_seconds
+
+    async def reset(self, key: str) -> bool:
+        """
+        重置指定 key 的计数
 
-            # 按前缀分组统计
-            prefix_stats = {}
-            for key in self._cache.keys():
-                prefix = key.split(":")[0] if ":" in key else key
-                prefix_stats[prefix] = prefix_stats.get(prefix, 0) + 1
+        Args:
+            key: 要重置的限制键
+
+        Returns:
+            是否成功重置（key 存在则为 True）
+        """
+        return self._cache.pop(key, None) is not None
 
-            return {
-                "total_keys": total_keys,
-                "total_records": total_records,
-                "prefix_stats": prefix_stats,
-                "last_cleanup": self._last_cleanup.isoformat(),
-            }
+    def _cleanup_expired(self, now: float) -> None:
+        """
+        清理所有已结束的窗口
+
+        Args:
+            now: 当前时间（单调时钟）
+        """
+        keys_to_delete = [
+            key for key, window in self._cache.items() if window[0] <= now
+        ]
+        for key in keys_to_delete:
+            del self._cache[key]
+
+        if keys_to_delete:
+            logger.debug(f"清理了 {len(keys_to_delete)} 个过期的速率限制窗口")
+
+    async def get_stats(self) -> dict:
+        """
+        获取速率限制器的统计信息
+
+        Returns:
+            包含统计信息的字典，total_records 为各窗口内的请求数之和
+        """
+        total_keys = len(self._cache)
+        total_records = sum(int(window[1]) for window in self._cache.values())
+
+        # 按前缀分组统计
+        prefix_stats = {}
+        for key in self._cache.keys():
+            prefix = key.split(":")[0] if ":" in key else key
+            prefix_stats[prefix] = prefix_stats.get(prefix, 0) + 1
+
+        return {
+            "total_keys": total_keys,
+            "total_records": total_records,
+            "prefix_stats": prefix_stats,
+            "last_cleanup": self._last_cleanup.isoformat(),
+        }
 
 
 # 全局速率限制器单例
 rate_limiter = SlidingWindowRateLimiter()
+
+# 全局请求速率限制器单例（固定窗口）
+fixed_window_rate_limiter = FixedWindowRateLimiter()
+
+
+def get_global_rate_limiter() -> Union[SlidingWindowRateLimiter, FixedWindowRateLimiter]:
+    """
+    获取全局请求限制使用的限制器
+
+    由 rate_limit_global_algorithm 配置决定，sliding_window 时与登录限制共用滑动窗口限制器
+
+    Returns:
+        速率限制器单例
+    """
+    if security_settings.rate_limit_global_algorithm == "sliding_window":
+        return rate_limiter
+    return fixed_window_rate_limiter
+
+
+async def get_rate_limit_stats() -> dict:
+    """
+    汇总所有在用速率限制器的统计信息
+
+    Returns:
+        统计信息字典，格式与 get_stats() 相同，另含全局限制算法 global_algorithm
+    """
+    stats = await rate_limiter.get_stats()
+
+    global_limiter = get_global_rate_limiter()
+    if global_limiter is not rate_limiter:
+        global_stats = await global_limiter.get_stats()
+        stats["total_keys"] += global_stats["total_keys"]
+        stats["total_records"] += global_stats["total_records"]
+        for prefix, count in global_stats["prefix_stats"].items():
+            stats["prefix_stats"][prefix] = stats["prefix_stats"].get(prefix, 0) + count
+        # 取较早的一次清理时间
+        stats["last_cleanup"] = min(stats["last_cleanup"], global_stats["last_cleanup"])
+
+    stats["global_algorithm"] = security_settings.rate_limit_global_algorithm
+    return stats
@@ -15,7 +15,7 @@
 """
 
 from functools import lru_cache
-from typing import Optional
+from typing import Literal, Optional
 
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
@@ -82,6 +82,17 @@ class SecuritySettings(BaseSettings):
     rate_limit_global_max: int = 100
     # 全局限制时间窗口（秒）
     rate_limit_global_window: int = 60
+    # 全局限制算法：fixed_window（固定窗口，O(1) 开销）或 sliding_window（滑动窗口，更精确）
+    rate_limit_global_algorithm: Literal["fixed_window", "sliding_window"] = "fixed_window"
+    # 不受全局限制的路径前缀（健康检查、静态资源、API 文档）
+    rate_limit_exempt_paths: list[str] = [
+        "/health",
+        "/static/",
+        "/app/assets/",
+        "/docs",
+        "/redoc",
+        "/openapi.json",
+    ]
 
     # ============ 账户锁定 ============
     # 是否启用账户锁定
@@ -102,7 +113,7 @@ class SecuritySettings(BaseSettings):
     # ============ IP 黑名单 ============
     # 是否启用黑名单模式
     ip_blacklist_enabled: bool = True
-    # 静态 IP 黑名单列表
+    # 静态 IP 黑名单列表（支持单个 IP 和 CIDR 格式）
     ip_blacklist: list[str] = []
 
     # ============ 自动 IP 封禁 ============
@@ -122,6 +133,9 @@ class SecuritySettings(BaseSettings):
     # ============ 安全响应头 ============
     # 是否启用安全响应头
     security_headers_enabled: bool = True
+    # 不添加安全响应头的路径前缀（供探针调用的健康检查等）
+    # 静态资源仍需要 X-Content-Type-Options 防止 MIME 嗅探，不建议加入
+    security_headers_exempt_paths: list[str] = ["/health"]
     # Content-Security-Policy
     csp_policy: str = "default-src 'self'; script-src 'self' 'unsafe-inline' 'unsafe-eval'; style-src 'self' 'unsafe-inline'; img-src 'self' data:; font-src 'self' data:; connect-src 'self'"
     # X-Frame-Options
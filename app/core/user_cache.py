@@ -0,0 +1,103 @@
+"""
+用户认证状态缓存模块
+
+缓存令牌验证所需的用户状态（用户名、启用状态、令牌版本），
+避免网关每次调用 /auth/validate 都查询用户表。
+
+特点：
+- 短 TTL，其他实例上的变更最多延迟 TTL 秒生效
+- 本实例修改用户（改密、禁用、删除、登出）时主动失效
+- 只查询所需的列，不加载完整的用户对象
+"""
+
+import time
+from typing import Dict, NamedTuple, Optional, Tuple
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.db.models.user import User
+
+
+class UserAuthState(NamedTuple):
+    """令牌验证所需的用户状态"""
+
+    id: str
+    username: str
+    is_active: bool
+    token_version: int
+
+
+class UserAuthStateCache:
+    """
+    用户认证状态缓存
+
+    使用示例：
+        state = await user_auth_cache.get(db, user_id)
+        if state is None or not state.is_active:
+            raise HTTPException(401, "用户不存在或已被禁用")
+
+        # 修改用户后使缓存失效
+        user_auth_cache.invalidate(user_id)
+    """
+
+    def __init__(self, ttl_seconds: float = 10, max_size: int = 50000):
+        """
+        初始化缓存
+
+        Args:
+            ttl_seconds: 缓存有效期（秒）
+            max_size: 最大缓存条目数，超出时清空重建
+        """
+        # 缓存结构: {user_id: (过期时间, 用户状态)}
+        self._cache: Dict[str, Tuple[float, UserAuthState]] = {}
+        self._ttl = ttl_seconds
+        self._max_size = max_size
+
+    async def get(self, db: AsyncSession, user_id: str) -> Optional[UserAuthState]:
+        """
+        获取用户认证状态，缓存未命中时查询数据库
+
+        Args:
+            db: 数据库会话
+            user_id: 用户 ID
+
+        Returns:
+            用户认证状态，用户不存在时返回 None
+        """
+        now = time.monotonic()
+
+        cached = self._cache.get(user_id)
+        if cached is not None and cached[0] > now:
+            return cached[1]
+
+        result = await db.execute(
+            select(
+                User.id, User.username, User.is_active, User.token_version
+            ).where(User.id == user_id)
+        )
+        row = result.one_or_none()
+        if row is None:
+            self._cache.pop(user_id, None)
+            return None
+
+        state = UserAuthState(*row)
+
+        if len(self._cache) >= self._max_size:
+            self._cache.clear()
+        self._cache[user_id] = (now + self._ttl, state)
+
+        return state
+
+    def invalidate(self, user_id: str) -> None:
+        """
+        使指定用户的缓存失效
+
+        Args:
+            user_id: 用户 ID
+        """
+        self._cache.pop(user_id, None)
+
+
+# 全局用户认证状态缓存单例
+user_auth_cache = UserAuthStateCache()
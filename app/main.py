@@ -11,27 +11,26 @@ IAM 系统 - 身份认证与访问管理
 - 威胁检测和自动响应
 """
 
+import gzip
+import hashlib
+import os
 import warnings
 from contextlib import asynccontextmanager
 from pathlib import Path
 
-from fastapi import FastAPI, Request
+from fastapi import FastAPI, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse, RedirectResponse
+from fastapi.responses import FileResponse, HTMLResponse, RedirectResponse
 
 from app.core.config import settings
+from app.core.deps import json_body_models
 from app.core.security_config import security_settings
 from app.db.base import Base
 from app.db.session import engine
 from app.api.v1.router import api_router
 from app.middleware.request_id import RequestIDMiddleware
-from app.middleware.security import (
-    IPFilterMiddleware,
-    RequestSizeMiddleware,
-    RateLimitMiddleware,
-    SecurityHeadersMiddleware,
-)
+from app.middleware.security import AegisSecurityMiddleware
 from app.web import router as web_router
 
 # 项目根目录
@@ -91,7 +90,6 @@ async def security_startup_check():
 
     # 生产环境使用自动生成密钥的警告
     if not settings.debug and settings.jwt_auto_generate_secret:
-        from app.core.config import _INSECURE_DEFAULT_KEYS
         # 检查原始配置是否是默认值（通过检查当前值是否不在默认列表中来判断是否自动生成了）
         if settings.jwt_secret_key not in _INSECURE_DEFAULT_KEYS:
             # 当前使用的是自动生成的密钥
@@ -128,6 +126,9 @@ async def lifespan(app: FastAPI):
     关闭时：
     1. 从服务中心注销
     2. 清理数据库资源
+
+    多进程模式下（run.py --workers N）建表、初始化数据和服务注册
+    由主进程完成一次，工作进程跳过这些步骤
     """
     # 导入服务注册模块
     from app.core.registry import init_registry_client, shutdown_registry_client
@@ -135,32 +136,40 @@ async def lifespan(app: FastAPI):
     # 启动时：执行安全检查
     await security_startup_check()
 
-    # 启动时：创建数据库表
-    async with engine.begin() as conn:
-        await conn.run_sync(Base.metadata.create_all)
+    if not settings.worker_process:
+        # 创建数据库表并初始化默认数据
+        await init_database()
 
-    # 初始化默认数据（如果需要）
-    await init_default_data()
-
-    # 注册到 ServiceAtlas 服务注册中心
-    await init_registry_client()
+        # 注册到 ServiceAtlas 服务注册中心
+        await init_registry_client()
 
     yield
 
-    # 关闭时：从服务注册中心注销
+    # 关闭时：从服务注册中心注销（工作进程未注册，此处为空操作）
     await shutdown_registry_client()
 
     # 清理数据库资源
     await engine.dispose()
 
 
+async def init_database():
+    """
+    创建数据库表并初始化默认数据
+    """
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+
+    # 初始化默认数据（如果需要）
+    await init_default_data()
+
+
 async def init_default_data():
     """
     初始化默认数据
 
     创建默认的超级管理员用户、系统角色和权限
     """
-    from sqlalchemy import select
+    from sqlalchemy import insert, select
     from app.db.session import async_session_maker
     from app.db.models.user import User
     from app.db.models.role import Role, Permission, RolePermission
@@ -195,19 +204,21 @@ async def init_default_data():
             ("aegis:audit:read", "查看审计日志", "aegis", "audit", "read"),
         ]
 
-        permissions = []
-        for code, name, service_code, resource, action in permissions_data:
-            permission = Permission(
-                code=code,
-                name=name,
-                service_code=service_code,
-                resource=resource,
-                action=action,
-            )
-            db.add(permission)
-            permissions.append(permission)
-
-        await db.flush()
+        # 批量插入权限，一条语句完成并返回生成的 ID
+        result = await db.execute(
+            insert(Permission).returning(Permission.id),
+            [
+                {
+                    "code": code,
+                    "name": name,
+                    "service_code": service_code,
+                    "resource": resource,
+                    "action": action,
+                }
+                for code, name, service_code, resource, action in permissions_data
+            ],
+        )
+        permission_ids = result.scalars().all()
 
         # 创建超级管理员角色
         admin_role = Role(
@@ -220,12 +231,13 @@ async def init_default_data():
         await db.flush()
 
         # 为管理员角色分配所有权限
-        for permission in permissions:
-            role_permission = RolePermission(
-                role_id=admin_role.id,
-                permission_id=permission.id,
-            )
-            db.add(role_permission)
+        await db.execute(
+            insert(RolePermission),
+            [
+                {"role_id": admin_role.id, "permission_id": permission_id}
+                for permission_id in permission_ids
+            ],
+        )
 
         # 创建默认超级管理员用户
         admin_user = User(
@@ -248,7 +260,7 @@ async def init_default_data():
         await db.commit()
 
         print("默认数据初始化完成:")
-        print(f"  - 创建了 {len(permissions)} 个权限")
+        print(f"  - 创建了 {len(permission_ids)} 个权限")
         print(f"  - 创建了超级管理员角色: {admin_role.code}")
         print(f"  - 创建了管理员用户: {admin_user.username} (密码: admin123)")
         print("  - 请在生产环境中修改默认密码!")
@@ -294,17 +306,9 @@ app.add_middleware(
 # 添加请求ID中间件
 app.add_middleware(RequestIDMiddleware)
 
-# 添加安全响应头中间件
-app.add_middleware(SecurityHeadersMiddleware)
-
-# 添加全局速率限制中间件
-app.add_middleware(RateLimitMiddleware)
-
-# 添加请求体大小限制中间件
-app.add_middleware(RequestSizeMiddleware)
-
-# 添加 IP 过滤中间件（最外层，最先执行）
-app.add_middleware(IPFilterMiddleware)
+# 添加安全中间件：IP 过滤、请求体大小限制、全局速率限制、安全响应头
+# （最外层，最先执行）
+app.add_middleware(AegisSecurityMiddleware)
 
 # 先定义内置端点（必须在网关路由之前）
 @app.get("/health", tags=["健康检查"])
@@ -316,8 +320,6 @@ async def health_check():
 @app.get("/", tags=["根路径"])
 async def root(request: Request):
     """根路径 - 重定向到 Vue 前端"""
-    from fastapi.responses import RedirectResponse
-
     # 获取代理前缀（通过 Hermes 访问时会有 X-Forwarded-Prefix header）
     base_path = request.headers.get("X-Forwarded-Prefix", "").rstrip("/")
 
@@ -327,15 +329,80 @@ async def root(request: Request):
 # 注册 API 路由
 app.include_router(api_router)
 
+
+def custom_openapi() -> dict:
+    """
+    生成 OpenAPI 文档
+
+    登录等接口在函数内解析请求体，FastAPI 不会为其模型生成定义，
+    这里把 json_body_models 补充到 components/schemas，供 $ref 引用
+    """
+    if app.openapi_schema is None:
+        openapi_schema = FastAPI.openapi(app)
+        schemas = openapi_schema.setdefault("components", {}).setdefault("schemas", {})
+        for model in json_body_models:
+            model_schema = model.model_json_schema(ref_template="#/components/schemas/{model}")
+            schemas.update(model_schema.pop("$defs", {}))
+            schemas[model.__name__] = model_schema
+    return app.openapi_schema
+
+
+app.openapi = custom_openapi
+
 # 挂载静态文件
 app.mount("/static", StaticFiles(directory=str(BASE_DIR / "static")), name="static")
 
 # 注册 Web 管理界面路由
 app.include_router(web_router)
 
+def accepts_gzip(accept_encoding: str) -> bool:
+    """
+    判断 Accept-Encoding 是否接受 gzip
+
+    按 RFC 9110 解析各编码的 q 值：gzip（或 x-gzip）显式列出时以其 q 值为准，
+    否则看通配符 *，q=0 表示不接受
+
+    Args:
+        accept_encoding: Accept-Encoding 请求头的值
+
+    Returns:
+        True 表示可以返回 gzip 压缩的内容
+    """
+    accept_encoding = accept_encoding.lower()
+    if "gzip" not in accept_encoding and "*" not in accept_encoding:
+        return False
+
+    gzip_q = wildcard_q = None
+    for item in accept_encoding.split(","):
+        coding, _, params = item.partition(";")
+        coding = coding.strip()
+        if coding not in ("gzip", "x-gzip", "*"):
+            continue
+
+        q = 1.0
+        for param in params.split(";"):
+            name, _, value = param.partition("=")
+            if name.strip() == "q":
+                try:
+                    q = float(value.strip())
+                except ValueError:
+                    q = 0.0
+
+        if coding == "*":
+            wildcard_q = q
+        else:
+            gzip_q = q
+
+    if gzip_q is not None:
+        return gzip_q > 0
+    return wildcard_q is not None and wildcard_q > 0
+
+
 # Vue 前端路由（如果构建产物存在）
 VUE_APP_DIR = BASE_DIR / "static" / "app"
-if VUE_APP_DIR.exists() and (VUE_APP_DIR / "index.html").exists():
+# SPA 入口页的绝对路径，只在导入时拼接一次
+VUE_INDEX_FILE = str(VUE_APP_DIR / "index.html")
+if VUE_APP_DIR.exists() and os.path.exists(VUE_INDEX_FILE):
     # 挂载 Vue 静态资源
     app.mount("/app/assets", StaticFiles(directory=str(VUE_APP_DIR / "assets")), name="vue-assets")
 
@@ -346,8 +413,41 @@ if VUE_APP_DIR.exists() and (VUE_APP_DIR / "index.html").exists():
         prefix = request.headers.get("X-Forwarded-Prefix", "").rstrip("/")
         return RedirectResponse(url=f"{prefix}/app/", status_code=302)
 
+    # SPA 入口页在一次部署内不变，启动时读取一次，之后直接返回缓存的字节
+    with open(VUE_INDEX_FILE, "rb") as f:
+        VUE_INDEX_HTML = f.read()
+    # 同时缓存 gzip 压缩后的内容，压缩只在启动时做一次
+    VUE_INDEX_GZIP = gzip.compress(VUE_INDEX_HTML, compresslevel=9)
+    # 入口页引用带哈希的资源文件，浏览器每次需向服务端确认是否有新版本，
+    # 未变化时只返回 304，不重复传输页面内容
+    vue_index_etag = hashlib.blake2b(VUE_INDEX_HTML, digest_size=16).hexdigest()
+    VUE_INDEX_HEADERS = {
+        "ETag": f'"{vue_index_etag}"',
+        "Cache-Control": "no-cache",
+        "Vary": "Accept-Encoding",
+    }
+    VUE_INDEX_GZIP_HEADERS = {
+        **VUE_INDEX_HEADERS,
+        # 压缩后是不同的表示，使用不同的 ETag
+        "ETag": f'"{vue_index_etag}-gzip"',
+        "Content-Encoding": "gzip",
+    }
+
     @app.get("/app/", include_in_schema=False)
     @app.get("/app/{path:path}", include_in_schema=False)
-    async def vue_app(path: str = ""):
+    async def vue_app(request: Request, path: str = ""):
         """Vue SPA 入口，所有路由返回 index.html"""
-        return FileResponse(str(VUE_APP_DIR / "index.html"))
+        # 调试模式下每次读取文件，便于前端重新构建后直接生效
+        if settings.debug:
+            return FileResponse(VUE_INDEX_FILE)
+
+        if accepts_gzip(request.headers.get("accept-encoding", "")):
+            content, headers = VUE_INDEX_GZIP, VUE_INDEX_GZIP_HEADERS
+        else:
+            content, headers = VUE_INDEX_HTML, VUE_INDEX_HEADERS
+
+        if_none_match = request.headers.get("if-none-match")
+        if if_none_match and (if_none_match == "*" or headers["ETag"] in if_none_match):
+            return Response(status_code=304, headers=headers)
+
+        return HTMLResponse(content, headers=headers)
@@ -2,29 +2,50 @@
 请求ID中间件
 
 为每个请求添加唯一的请求ID
+
+实现为纯 ASGI 中间件，避免 BaseHTTPMiddleware 为每个请求额外创建任务和包装请求/响应流
 """
 
-from uuid import uuid4
+from secrets import token_hex
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
 
-from starlette.middleware.base import BaseHTTPMiddleware
-from starlette.requests import Request
-from starlette.responses import Response
+# 请求ID头名称（ASGI 头部名称均为小写字节串）
+REQUEST_ID_HEADER = b"x-request-id"
 
 
-class RequestIDMiddleware(BaseHTTPMiddleware):
+class RequestIDMiddleware:
     """请求ID中间件"""
 
-    async def dispatch(self, request: Request, call_next) -> Response:
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
         # 从请求头获取或生成请求ID
-        request_id = request.headers.get("X-Request-ID") or str(uuid4())
+        request_id = None
+        for name, value in scope["headers"]:
+            if name == REQUEST_ID_HEADER:
+                request_id = value
+                break
+        if not request_id:
+            # 请求ID无需 UUID 语义，直接生成 32 位十六进制随机串
+            request_id = token_hex(16).encode("ascii")
 
         # 将请求ID存储到 request.state
-        request.state.request_id = request_id
+        scope.setdefault("state", {})["request_id"] = request_id.decode("latin-1")
 
-        # 继续处理请求
-        response = await call_next(request)
-
-        # 将请求ID添加到响应头
-        response.headers["X-Request-ID"] = request_id
+        async def send_wrapper(message: Message) -> None:
+            # 将请求ID添加到响应头
+            if message["type"] == "http.response.start":
+                message["headers"] = [
+                    *message.get("headers", ()),
+                    (REQUEST_ID_HEADER, request_id),
+                ]
+            await send(message)
 
-        return response
+        # 继续处理请求
+        await self.app(scope, receive, send_wrapper)
@@ -1,335 +1,408 @@
 """
 安全中间件模块
 
-包含多个安全相关的中间件：
-- IPFilterMiddleware: IP 黑白名单过滤
-- RequestSizeMiddleware: 请求体大小限制
-- RateLimitMiddleware: 全局速率限制
-- SecurityHeadersMiddleware: 安全响应头
-
-中间件执行顺序（从外到内）：
-1. IPFilterMiddleware - 最先执行，拦截黑名单 IP
-2. RequestSizeMiddleware - 限制请求体大小
-3. RateLimitMiddleware - 全局速率限制
-4. SecurityHeadersMiddleware - 添加安全响应头
+AegisSecurityMiddleware 在一个中间件内依次完成：
+1. IP 过滤 - 白名单、静态黑名单和数据库封禁
+2. 请求体大小限制
+3. 全局速率限制
+4. 添加安全响应头
+
+实现为单个纯 ASGI 中间件，直接读取 scope 中的原始请求头：
+- 每个请求只遍历一次请求头、只写一次响应头
+- 避免多层中间件各自解析请求头和改写响应头
+- 避免 BaseHTTPMiddleware 为每个请求额外创建任务和包装请求/响应对象
 """
 
-from datetime import datetime, timezone
-from typing import Callable
+import re
+from typing import Optional
 
-from fastapi import Request
-from fastapi.responses import JSONResponse
-from starlette.middleware.base import BaseHTTPMiddleware
-from starlette.responses import Response
+import orjson
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
 
+from app.core.ip_ban_cache import ip_ban_cache
+from app.core.ip_matcher import IPMatcher
 from app.core.security_config import security_settings
-from app.core.rate_limiter import rate_limiter
+from app.core.rate_limiter import get_global_rate_limiter
 
 
-def get_client_ip(request: Request) -> str:
+def resolve_client_ip(
+    forwarded_for: Optional[bytes],
+    real_ip: Optional[bytes],
+    client: Optional[tuple[str, int]],
+) -> str:
     """
-    获取客户端真实 IP 地址
-
-    支持代理场景，会检查以下头部：
-    - X-Forwarded-For: 标准代理头，取第一个 IP（客户端真实 IP）
-    - X-Real-IP: Nginx 常用头
-    - 直接连接的 client.host
+    根据代理头和直连地址确定客户端真实 IP
 
     Args:
-        request: FastAPI 请求对象
+        forwarded_for: X-Forwarded-For 原始头部值
+        real_ip: X-Real-IP 原始头部值
+        client: ASGI scope 中的直连地址 (host, port)
 
     Returns:
         客户端 IP 地址字符串
     """
     # 优先从 X-Forwarded-For 获取（多级代理场景）
-    forwarded_for = request.headers.get("X-Forwarded-For")
     if forwarded_for:
         # X-Forwarded-For 格式: client, proxy1, proxy2
-        # 取第一个即为客户端真实 IP
-        return forwarded_for.split(",")[0].strip()
+        # 取第一个即为客户端真实 IP，直接在字节串上截取，
+        # 不拆分出所有代理跳数，也不解码整个头部值
+        return forwarded_for.partition(b",")[0].strip().decode("latin-1")
 
     # 其次从 X-Real-IP 获取（单级代理场景）
-    real_ip = request.headers.get("X-Real-IP")
     if real_ip:
-        return real_ip.strip()
+        return real_ip.strip().decode("latin-1")
 
     # 最后使用直连 IP
-    if request.client:
-        return request.client.host
+    if client:
+        return client[0]
 
     return "unknown"
 
 
-class IPFilterMiddleware(BaseHTTPMiddleware):
+async def send_json_response(
+    send: Send,
+    status_code: int,
+    content: dict,
+    headers: Optional[list[tuple[bytes, bytes]]] = None,
+) -> None:
     """
-    IP 过滤中间件
+    直接发送 JSON 响应
+
+    中间件拒绝请求时使用，省去构建 Response 对象，使用 orjson 直接序列化为字节串
 
-    执行顺序：最外层（最先执行）
+    Args:
+        send: ASGI send
+        status_code: HTTP 状态码
+        content: 响应内容
+        headers: 额外的响应头
+    """
+    body = orjson.dumps(content)
+    await send(
+        {
+            "type": "http.response.start",
+            "status": status_code,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode("latin-1")),
+                *(headers or ()),
+            ],
+        }
+    )
+    await send({"type": "http.response.body", "body": body})
+
+
+class AegisSecurityMiddleware:
+    """
+    安全中间件
 
-    功能：
-    - 白名单模式：只允许白名单中的 IP 访问
-    - 黑名单模式：阻止黑名单和数据库中封禁的 IP
+    按以下顺序处理请求，任一步骤拒绝时直接返回错误响应：
+    1. IP 过滤：白名单模式只允许白名单 IP；黑名单模式阻止黑名单和数据库中封禁的 IP
+    2. 请求体大小：检查 Content-Length 头，拒绝过大的请求，防止 DoS 攻击
+    3. 全局速率限制：限制单 IP 的全局请求频率
+    4. 安全响应头：防止点击劫持、XSS、MIME 嗅探等攻击
 
     配置：
-    - ip_whitelist_enabled: 启用白名单模式
-    - ip_whitelist: 白名单列表
-    - ip_blacklist_enabled: 启用黑名单模式
-    - ip_blacklist: 静态黑名单列表
+    - ip_whitelist_enabled / ip_whitelist: 白名单模式和白名单列表
+    - ip_blacklist_enabled / ip_blacklist: 黑名单模式和静态黑名单列表
+    - request_max_body_size: 最大请求体大小（字节）
+    - rate_limit_enabled: 是否启用速率限制
+    - rate_limit_global_max / rate_limit_global_window: 最大请求数和时间窗口（秒）
+    - rate_limit_global_algorithm: 限制算法（fixed_window / sliding_window）
+    - rate_limit_exempt_paths: 不受速率限制的路径前缀
+    - security_headers_enabled: 是否添加安全响应头
+    - security_headers_exempt_paths: 不添加安全响应头的路径前缀
+    - csp_policy、frame_options、content_type_options、xss_protection、
+      referrer_policy、permissions_policy、hsts_max_age: 各安全响应头的值
+
+    速率限制响应头：
+    - X-RateLimit-Limit: 限制的请求数
+    - X-RateLimit-Remaining: 剩余请求数
+    - X-RateLimit-Reset: 重置时间（秒）
     """
 
-    async def dispatch(self, request: Request, call_next: Callable) -> Response:
-        client_ip = get_client_ip(request)
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+        # IP 白名单和黑名单均支持单个 IP 和 CIDR 网段，启动时构建匹配器
+        self._whitelist = IPMatcher(security_settings.ip_whitelist)
+        self._blacklist = IPMatcher(security_settings.ip_blacklist)
+
+        # 全局限制请求量大、精度要求低，默认使用固定窗口
+        self._limiter = get_global_rate_limiter()
+        # 限制数在运行期间不变，预先编码好响应头
+        self._limit_header = (
+            b"x-ratelimit-limit",
+            str(security_settings.rate_limit_global_max).encode("latin-1"),
+        )
+        # 豁免路径前缀预编译为一个正则，每个请求只需一次匹配
+        exempt_paths = security_settings.rate_limit_exempt_paths
+        self._exempt_re = (
+            re.compile("|".join(re.escape(path) for path in exempt_paths))
+            if exempt_paths
+            else None
+        )
+
+        # 安全响应头配置在运行期间不变，启动时一次性编码为原始响应头
+        self._static_headers = self._build_static_headers()
+        self._hsts_header = self._build_hsts_header()
+        self._header_exempt_prefixes = tuple(security_settings.security_headers_exempt_paths)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        # 一次遍历取出后续步骤需要的请求头（同名头取第一个）
+        forwarded_for = real_ip = content_length = forwarded_proto = None
+        for name, value in scope["headers"]:
+            if name == b"x-forwarded-for":
+                if forwarded_for is None:
+                    forwarded_for = value
+            elif name == b"x-real-ip":
+                if real_ip is None:
+                    real_ip = value
+            elif name == b"content-length":
+                if content_length is None:
+                    content_length = value
+            elif name == b"x-forwarded-proto":
+                if forwarded_proto is None:
+                    forwarded_proto = value
+
+        client_ip = resolve_client_ip(forwarded_for, real_ip, scope.get("client"))
 
         # 将客户端 IP 存储到 request.state，供后续使用
-        request.state.client_ip = client_ip
+        scope.setdefault("state", {})["client_ip"] = client_ip
+
+        # 1. IP 过滤
+        if not await self._check_ip(client_ip, send):
+            return
+
+        # 2. 请求体大小限制（Content-Length 不是有效数字时忽略）
+        # 超限时直接响应，不调用应用，请求体不会被读入内存
+        if (
+            content_length
+            and content_length.isdigit()
+            and not await self._check_body_size(int(content_length), send)
+        ):
+            return
+
+        # 需要追加的响应头
+        extra_headers: list[tuple[bytes, bytes]] = []
+
+        # 3. 全局速率限制（豁免路径不计数也不添加响应头）
+        rate_limited = security_settings.rate_limit_enabled and not (
+            self._exempt_re is not None and self._exempt_re.match(scope["path"])
+        )
+        if rate_limited:
+            rate_limit_headers = await self._check_rate_limit(client_ip, send)
+            if rate_limit_headers is None:
+                return
+            extra_headers.extend(rate_limit_headers)
+
+        # 4. 安全响应头（豁免路径不添加）
+        if security_settings.security_headers_enabled and not scope["path"].startswith(
+            self._header_exempt_prefixes
+        ):
+            extra_headers.extend(self._static_headers)
+            # 通过代理时检查 X-Forwarded-Proto
+            if scope.get("scheme") == "https" or forwarded_proto == b"https":
+                extra_headers.append(self._hsts_header)
+
+        if not extra_headers:
+            await self.app(scope, receive, send)
+            return
+
+        async def send_wrapper(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                headers = message.get("headers", ())
+                if rate_limited:
+                    # 全局速率限制头覆盖接口自行设置的同名头
+                    headers = [
+                        header for header in headers
+                        if not header[0].startswith(b"x-ratelimit-")
+                    ]
+                message["headers"] = [*headers, *extra_headers]
+            await send(message)
+
+        await self.app(scope, receive, send_wrapper)
+
+    # ============ IP 过滤 ============
+
+    async def _check_ip(self, client_ip: str, send: Send) -> bool:
+        """
+        检查 IP 黑白名单和封禁记录
+
+        Args:
+            client_ip: 客户端 IP
+            send: ASGI send，拒绝时用于发送 403 响应
 
+        Returns:
+            True 表示放行，False 表示已拒绝请求
+        """
         # 白名单模式：只允许白名单 IP
+        # 按配置的列表判断是否生效，而不是匹配器大小：条目全部无效时匹配器为空，
+        # 此时应拒绝所有 IP，不能当作未配置白名单而全部放行
         if security_settings.ip_whitelist_enabled and security_settings.ip_whitelist:
-            if not self._is_ip_in_list(client_ip, security_settings.ip_whitelist):
-                return JSONResponse(
-                    status_code=403,
-                    content={
+            if client_ip not in self._whitelist:
+                await send_json_response(
+                    send,
+                    403,
+                    {
                         "detail": "访问被拒绝：IP 不在白名单中",
                         "error_code": "IP_NOT_IN_WHITELIST",
                     },
                 )
+                return False
 
         # 黑名单模式：阻止黑名单 IP
         if security_settings.ip_blacklist_enabled:
             # 检查静态黑名单
-            if self._is_ip_in_list(client_ip, security_settings.ip_blacklist):
-                return JSONResponse(
-                    status_code=403,
-                    content={
+            if client_ip in self._blacklist:
+                await send_json_response(
+                    send,
+                    403,
+                    {
                         "detail": "访问被拒绝：IP 已被永久封禁",
                         "error_code": "IP_PERMANENTLY_BANNED",
                     },
                 )
+                return False
 
-            # 检查数据库中的封禁记录
-            is_banned, reason = await self._check_ip_banned(client_ip)
+            # 检查数据库中的封禁记录（内存快照）
+            is_banned, reason = await ip_ban_cache.check(client_ip)
             if is_banned:
-                return JSONResponse(
-                    status_code=403,
-                    content={
+                await send_json_response(
+                    send,
+                    403,
+                    {
                         "detail": f"访问被拒绝：{reason}",
                         "error_code": "IP_TEMPORARILY_BANNED",
                     },
                 )
+                return False
 
-        return await call_next(request)
+        return True
 
-    def _is_ip_in_list(self, ip: str, ip_list: list) -> bool:
-        """
-        检查 IP 是否在列表中
+    # ============ 请求体大小限制 ============
 
-        支持精确匹配和 CIDR 格式（简化实现）
+    async def _check_body_size(self, size: int, send: Send) -> bool:
+        """
+        检查 Content-Length 是否超过限制
 
         Args:
-            ip: 要检查的 IP
-            ip_list: IP 列表
+            size: Content-Length 声明的请求体大小
+            send: ASGI send，拒绝时用于发送 413 响应
 
         Returns:
-            True 如果 IP 在列表中
+            True 表示放行，False 表示已拒绝请求
         """
-        # 简单实现：精确匹配
-        # TODO: 可扩展支持 CIDR 格式（如 192.168.1.0/24）
-        return ip in ip_list
+        max_size = security_settings.request_max_body_size
+        if size > max_size:
+            max_size_mb = max_size // 1024 // 1024
+            await send_json_response(
+                send,
+                413,
+                {
+                    "detail": f"请求体过大，最大允许 {max_size_mb}MB",
+                    "error_code": "REQUEST_ENTITY_TOO_LARGE",
+                    "max_size_bytes": max_size,
+                    "actual_size_bytes": size,
+                },
+                # 不读取请求体，响应后关闭连接，让客户端停止继续发送
+                headers=[(b"connection", b"close")],
+            )
+            return False
 
-    async def _check_ip_banned(self, ip: str) -> tuple[bool, str]:
+        return True
+
+    # ============ 全局速率限制 ============
+
+    async def _check_rate_limit(
+        self, client_ip: str, send: Send
+    ) -> Optional[list[tuple[bytes, bytes]]]:
         """
-        检查 IP 是否在数据库封禁列表中
+        检查全局速率限制
 
         Args:
-            ip: 要检查的 IP
+            client_ip: 客户端 IP
+            send: ASGI send，超出限制时用于发送 429 响应
 
         Returns:
-            (是否被封禁, 封禁原因)
+            放行时返回速率限制响应头，已拒绝请求时返回 None
         """
-        try:
-            from sqlalchemy import select
-            from app.db.models.ip_ban import IPBanRecord
-            from app.db.session import async_session_maker
-
-            async with async_session_maker() as db:
-                now = datetime.now(timezone.utc)
-                result = await db.execute(
-                    select(IPBanRecord).where(
-                        IPBanRecord.ip == ip,
-                        IPBanRecord.unbanned_at.is_(None),
-                        (IPBanRecord.expires_at.is_(None)) | (IPBanRecord.expires_at > now),
-                    ).limit(1)
-                )
-                record = result.scalar_one_or_none()
-
-                if record:
-                    return True, record.reason
-
-            return False, ""
-
-        except Exception as e:
-            # 数据库查询失败不应阻止正常请求
-            # 只记录日志，不拒绝请求
-            import logging
-            logging.getLogger(__name__).warning(f"IP 封禁检查失败: {e}")
-            return False, ""
-
-
-class RequestSizeMiddleware(BaseHTTPMiddleware):
-    """
-    请求体大小限制中间件
-
-    执行顺序：第二层
-
-    功能：
-    - 检查 Content-Length 头，拒绝过大的请求
-    - 防止大请求造成的 DoS 攻击
-
-    配置：
-    - request_max_body_size: 最大请求体大小（字节）
-    """
-
-    async def dispatch(self, request: Request, call_next: Callable) -> Response:
-        content_length = request.headers.get("content-length")
-
-        if content_length:
-            try:
-                size = int(content_length)
-                max_size = security_settings.request_max_body_size
-
-                if size > max_size:
-                    max_size_mb = max_size // 1024 // 1024
-                    return JSONResponse(
-                        status_code=413,
-                        content={
-                            "detail": f"请求体过大，最大允许 {max_size_mb}MB",
-                            "error_code": "REQUEST_ENTITY_TOO_LARGE",
-                            "max_size_bytes": max_size,
-                            "actual_size_bytes": size,
-                        },
-                    )
-            except ValueError:
-                # Content-Length 不是有效数字，忽略
-                pass
-
-        return await call_next(request)
-
-
-class RateLimitMiddleware(BaseHTTPMiddleware):
-    """
-    全局速率限制中间件
-
-    执行顺序：第三层
-
-    功能：
-    - 限制单 IP 的全局请求频率
-    - 返回标准的速率限制响应头
-
-    配置：
-    - rate_limit_enabled: 是否启用
-    - rate_limit_global_max: 最大请求数
-    - rate_limit_global_window: 时间窗口（秒）
-
-    响应头：
-    - X-RateLimit-Limit: 限制的请求数
-    - X-RateLimit-Remaining: 剩余请求数
-    - X-RateLimit-Reset: 重置时间（秒）
-    """
-
-    async def dispatch(self, request: Request, call_next: Callable) -> Response:
-        # 如果未启用速率限制，直接放行
-        if not security_settings.rate_limit_enabled:
-            return await call_next(request)
-
-        # 获取客户端 IP
-        client_ip = getattr(request.state, "client_ip", None) or get_client_ip(request)
         key = f"global:{client_ip}"
 
         # 检查速率限制
-        allowed, remaining, reset_seconds = await rate_limiter.is_allowed(
+        allowed, remaining, reset_seconds = await self._limiter.is_allowed(
             key,
             security_settings.rate_limit_global_max,
             security_settings.rate_limit_global_window,
         )
 
+        # 速率限制响应头，计数直接格式化为字节串
+        reset = b"%d" % reset_seconds
+        headers = [
+            self._limit_header,
+            (b"x-ratelimit-remaining", b"%d" % remaining),
+            (b"x-ratelimit-reset", reset),
+        ]
+
         if not allowed:
-            response = JSONResponse(
-                status_code=429,
-                content={
+            headers.append((b"retry-after", reset))
+            await send_json_response(
+                send,
+                429,
+                {
                     "detail": "请求过于频繁，请稍后再试",
                     "error_code": "RATE_LIMIT_EXCEEDED",
                     "retry_after": reset_seconds,
                 },
+                headers=headers,
             )
-        else:
-            response = await call_next(request)
-
-        # 添加速率限制响应头
-        response.headers["X-RateLimit-Limit"] = str(security_settings.rate_limit_global_max)
-        response.headers["X-RateLimit-Remaining"] = str(remaining)
-        response.headers["X-RateLimit-Reset"] = str(reset_seconds)
-
-        if not allowed:
-            response.headers["Retry-After"] = str(reset_seconds)
-
-        return response
+            return None
 
+        return headers
 
-class SecurityHeadersMiddleware(BaseHTTPMiddleware):
-    """
-    安全响应头中间件
-
-    执行顺序：第四层（最内层，靠近业务逻辑）
-
-    功能：
-    - 添加各种安全相关的 HTTP 响应头
-    - 防止点击劫持、XSS、MIME 嗅探等攻击
-
-    配置：
-    - security_headers_enabled: 是否启用
-    - csp_policy: Content-Security-Policy
-    - frame_options: X-Frame-Options
-    - content_type_options: X-Content-Type-Options
-    - xss_protection: X-XSS-Protection
-    - referrer_policy: Referrer-Policy
-    - hsts_max_age: HSTS max-age
-    - permissions_policy: Permissions-Policy
-    """
-
-    async def dispatch(self, request: Request, call_next: Callable) -> Response:
-        response = await call_next(request)
-
-        if not security_settings.security_headers_enabled:
-            return response
-
-        # Content-Security-Policy: 限制资源加载来源
-        response.headers["Content-Security-Policy"] = security_settings.csp_policy
-
-        # X-Frame-Options: 防止点击劫持
-        response.headers["X-Frame-Options"] = security_settings.frame_options
+    # ============ 安全响应头 ============
 
-        # X-Content-Type-Options: 防止 MIME 类型嗅探
-        response.headers["X-Content-Type-Options"] = security_settings.content_type_options
-
-        # X-XSS-Protection: XSS 过滤器（旧浏览器）
-        response.headers["X-XSS-Protection"] = security_settings.xss_protection
-
-        # Referrer-Policy: 控制 Referer 头的发送
-        response.headers["Referrer-Policy"] = security_settings.referrer_policy
+    @staticmethod
+    def _build_static_headers() -> list[tuple[bytes, bytes]]:
+        """
+        构建固定的安全响应头
 
-        # Permissions-Policy: 限制浏览器功能
-        response.headers["Permissions-Policy"] = security_settings.permissions_policy
+        Returns:
+            (头部名称, 头部值) 字节串元组列表
+        """
+        headers = [
+            # Content-Security-Policy: 限制资源加载来源
+            ("content-security-policy", security_settings.csp_policy),
+            # X-Frame-Options: 防止点击劫持
+            ("x-frame-options", security_settings.frame_options),
+            # X-Content-Type-Options: 防止 MIME 类型嗅探
+            ("x-content-type-options", security_settings.content_type_options),
+            # X-XSS-Protection: XSS 过滤器（旧浏览器）
+            ("x-xss-protection", security_settings.xss_protection),
+            # Referrer-Policy: 控制 Referer 头的发送
+            ("referrer-policy", security_settings.referrer_policy),
+            # Permissions-Policy: 限制浏览器功能
+            ("permissions-policy", security_settings.permissions_policy),
+        ]
+        return [
+            (name.encode("latin-1"), value.encode("latin-1"))
+            for name, value in headers
+        ]
+
+    @staticmethod
+    def _build_hsts_header() -> tuple[bytes, bytes]:
+        """
+        构建 HSTS 响应头
 
-        # Strict-Transport-Security: 强制 HTTPS（仅在 HTTPS 连接时有效）
-        # 通过代理时检查 X-Forwarded-Proto
-        is_https = (
-            request.url.scheme == "https"
-            or request.headers.get("X-Forwarded-Proto") == "https"
-        )
-        if is_https:
-            hsts_value = f"max-age={security_settings.hsts_max_age}"
-            if security_settings.hsts_include_subdomains:
-                hsts_value += "; includeSubDomains"
-            response.headers["Strict-Transport-Security"] = hsts_value
+        Strict-Transport-Security: 强制 HTTPS（仅在 HTTPS 连接时添加）
 
-        return response
+        Returns:
+            (头部名称, 头部值) 字节串元组
+        """
+        hsts_value = f"max-age={security_settings.hsts_max_age}"
+        if security_settings.hsts_include_subdomains:
+            hsts_value += "; includeSubDomains"
+        return (b"strict-transport-security", hsts_value.encode("latin-1"))
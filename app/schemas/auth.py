@@ -7,7 +7,7 @@
 from datetime import datetime
 from typing import Optional
 
-from pydantic import BaseModel, EmailStr, Field
+from pydantic import BaseModel, Field, TypeAdapter
 
 
 class LoginRequest(BaseModel):
@@ -58,6 +58,9 @@ class TokenPayload(BaseModel):
     roles: Optional[list[str]] = Field(default=None, description="角色列表")
     permissions: Optional[list[str]] = Field(default=None, description="权限列表")
 
+    # 载荷可能带有额外声明，不禁止多余字段
+    model_config = {"frozen": True}
+
 
 class CurrentUser(BaseModel):
     """当前用户信息"""
@@ -70,6 +73,9 @@ class CurrentUser(BaseModel):
     roles: list[str] = []
     permissions: list[str] = []
 
+    # 每个认证请求都会创建，构建后只读
+    model_config = {"frozen": True, "extra": "forbid"}
+
 
 class ValidateResponse(BaseModel):
     """Token 验证响应"""
@@ -79,3 +85,9 @@ class ValidateResponse(BaseModel):
     username: Optional[str] = Field(default=None, description="用户名")
     roles: list[str] = Field(default_factory=list, description="角色列表")
     permissions: list[str] = Field(default_factory=list, description="权限列表")
+
+    model_config = {"frozen": True, "extra": "forbid"}
+
+
+# 高频接口的请求体解析器，启动时构建一次
+login_request_adapter = TypeAdapter(LoginRequest)
@@ -7,7 +7,7 @@
 from datetime import datetime
 from typing import Optional
 
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, TypeAdapter
 
 
 class ServiceBase(BaseModel):
@@ -88,3 +88,7 @@ class S2STokenResponse(BaseModel):
     access_token: str = Field(..., description="访问令牌")
     token_type: str = Field(default="Bearer", description="令牌类型")
     expires_in: int = Field(..., description="过期时间（秒）")
+
+
+# 高频接口的请求体解析器，启动时构建一次
+s2s_token_request_adapter = TypeAdapter(S2STokenRequest)
@@ -5,16 +5,22 @@
 """
 
 from datetime import datetime
-from typing import Optional
+from typing import Annotated, Optional
 
-from pydantic import BaseModel, EmailStr, Field
+from pydantic import BaseModel, Field, StringConstraints
+
+# 邮箱格式：只做基本的正则校验，不依赖 email-validator
+Email = Annotated[
+    str,
+    StringConstraints(pattern=r"^[^@\s]+@[^@\s]+\.[^@\s]+$", max_length=254),
+]
 
 
 class UserBase(BaseModel):
     """用户基础模型"""
 
     username: str = Field(..., min_length=3, max_length=64, description="用户名")
-    email: EmailStr = Field(..., description="邮箱")
+    email: Email = Field(..., description="邮箱")
 
 
 class UserCreate(UserBase):
@@ -30,7 +36,7 @@ class UserUpdate(BaseModel):
     """更新用户请求"""
 
     username: Optional[str] = Field(None, min_length=3, max_length=64)
-    email: Optional[EmailStr] = None
+    email: Optional[Email] = None
     password: Optional[str] = Field(None, min_length=8)
     is_active: Optional[bool] = None
     is_superuser: Optional[bool] = None
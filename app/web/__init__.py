@@ -69,32 +69,36 @@ async def login_submit(request: Request):
     return RedirectResponse(url=get_vue_app_url(request, "/login"), status_code=302)
 
 
-@router.get("/admin/")
-@router.get("/admin")
-async def dashboard_page(request: Request):
-    """仪表盘页面 - 302 跳转到 Vue"""
-    return RedirectResponse(url=get_vue_app_url(request, "/"), status_code=302)
-
-
-@router.get("/admin/users")
-async def users_page(request: Request):
-    """用户管理页面 - 302 跳转到 Vue"""
-    return RedirectResponse(url=get_vue_app_url(request, "/users"), status_code=302)
-
+# 旧管理页面路径 -> (路由名称, Vue hash 路由, 页面名称)
+_PAGE_REDIRECTS = {
+    "/admin": ("dashboard_page", "/", "仪表盘"),
+    "/admin/": ("dashboard_page", "/", "仪表盘"),
+    "/admin/users": ("users_page", "/users", "用户管理"),
+    "/admin/roles": ("roles_page", "/roles", "角色管理"),
+    "/admin/policies": ("policies_page", "/policies", "认证策略管理"),
+    "/admin/audit": ("audit_page", "/audit", "审计日志"),
+}
+
+
+def _make_redirect_handler(hash_path: str):
+    """
+    生成跳转到指定 Vue 路由的处理函数
 
-@router.get("/admin/roles")
-async def roles_page(request: Request):
-    """角色管理页面 - 302 跳转到 Vue"""
-    return RedirectResponse(url=get_vue_app_url(request, "/roles"), status_code=302)
+    Args:
+        hash_path: Vue 的 hash 路由路径
+    """
 
+    async def redirect_to_vue(request: Request):
+        return RedirectResponse(url=get_vue_app_url(request, hash_path), status_code=302)
 
-@router.get("/admin/policies")
-async def policies_page(request: Request):
-    """认证策略管理页面 - 302 跳转到 Vue"""
-    return RedirectResponse(url=get_vue_app_url(request, "/policies"), status_code=302)
+    return redirect_to_vue
 
 
-@router.get("/admin/audit")
-async def audit_page(request: Request):
-    """审计日志页面 - 302 跳转到 Vue"""
-    return RedirectResponse(url=get_vue_app_url(request, "/audit"), status_code=302)
+for _path, (_name, _hash_path, _title) in _PAGE_REDIRECTS.items():
+    router.add_api_route(
+        _path,
+        _make_redirect_handler(_hash_path),
+        methods=["GET"],
+        name=_name,
+        description=f"{_title}页面 - 302 跳转到 Vue",
+    )
@@ -9,110 +9,266 @@ Aegis 启动脚本
     python run.py --port 8080        # 指定端口
     python run.py -p 8080 -H 0.0.0.0 # 指定端口和主机（内网可访问）
     python run.py --debug            # 启用调试模式
+    python run.py --workers 4        # 启动 4 个工作进程（生产环境）
+
+事件循环和 HTTP 解析器使用 uvicorn 的默认值 auto：uvloop 和 httptools
+（uvicorn[standard] 自带）可用时自动使用，否则回退到 asyncio 和 h11。
+
+多进程模式下由 uvicorn 主进程绑定端口，各工作进程共享同一个监听 socket，
+由内核分配连接，无需 SO_REUSEPORT。建表、初始化默认数据和服务注册
+由主进程完成一次，工作进程只处理请求。
 """
 
-import argparse
+import asyncio
 import os
+import sys
+import threading
+from typing import Any, Callable, Dict, List
 
-import uvicorn
 
+_USAGE = (
+    "usage: run.py [-h] [-p PORT] [-H HOST] [--debug] [--reload] [--workers WORKERS]\n"
+    "              [--no-access-log] [--registry-url REGISTRY_URL] [--no-registry]"
+)
 
-def parse_args():
-    """解析命令行参数"""
-    parser = argparse.ArgumentParser(
-        description="Aegis 权限控制网关服务",
-        formatter_class=argparse.RawDescriptionHelpFormatter,
-    )
+_HELP = f"""{_USAGE}
 
-    parser.add_argument(
-        "-p", "--port",
-        type=int,
-        default=None,
-        help="服务端口 (默认: 8000)",
-    )
+Aegis 权限控制网关服务
 
-    parser.add_argument(
-        "-H", "--host",
-        type=str,
-        default=None,
-        help="监听地址 (默认: 127.0.0.1，仅本地访问)",
-    )
+options:
+  -h, --help            显示帮助信息并退出
+  -p PORT, --port PORT  服务端口 (默认: 8000)
+  -H HOST, --host HOST  监听地址 (默认: 127.0.0.1，仅本地访问)
+  --debug               启用调试模式
+  --reload              启用热重载（开发模式）
+  --workers WORKERS     工作进程数 (默认: 1，热重载模式下固定为 1)
+  --no-access-log       禁用访问日志（默认仅调试模式开启）
+  --registry-url REGISTRY_URL
+                        ServiceAtlas 注册中心地址
+  --no-registry         禁用服务注册"""
 
-    parser.add_argument(
-        "--debug",
-        action="store_true",
-        default=None,
-        help="启用调试模式",
-    )
+# 开关参数: {参数名: 结果键}
+_FLAGS = {
+    "--debug": "debug",
+    "--reload": "reload",
+    "--no-access-log": "no_access_log",
+    "--no-registry": "no_registry",
+}
 
-    parser.add_argument(
-        "--reload",
-        action="store_true",
-        default=None,
-        help="启用热重载（开发模式）",
-    )
+# 带值参数: {参数名: (结果键, 类型转换)}
+_OPTIONS = {
+    "-p": ("port", int),
+    "--port": ("port", int),
+    "-H": ("host", str),
+    "--host": ("host", str),
+    "--workers": ("workers", int),
+    "--registry-url": ("registry_url", str),
+}
+
+
+def _usage_error(message: str) -> None:
+    """打印用法和错误信息后退出（与 argparse 一致，退出码 2）"""
+    print(_USAGE, file=sys.stderr)
+    print(f"run.py: error: {message}", file=sys.stderr)
+    sys.exit(2)
+
+
+def parse_args(argv: List[str]) -> Dict[str, Any]:
+    """
+    解析命令行参数
+
+    只有几个参数，直接遍历 argv 解析，省去导入 argparse
+
+    Args:
+        argv: 命令行参数（不含脚本名）
+
+    Returns:
+        参数字典，未指定的参数为 None（开关参数为 False，--reload 为 None）
+    """
+    args: Dict[str, Any] = {
+        "port": None,
+        "host": None,
+        "debug": False,
+        "reload": None,
+        "workers": None,
+        "no_access_log": False,
+        "registry_url": None,
+        "no_registry": False,
+    }
+
+    remaining = iter(argv)
+    for arg in remaining:
+        # 支持 --port=8080、-p8080 和 -p=8080 形式
+        if arg.startswith("--"):
+            name, has_value, value = arg.partition("=")
+        elif len(arg) > 2 and arg[:2] in _OPTIONS:
+            name, has_value, value = arg[:2], "=", arg[2:].removeprefix("=")
+        else:
+            name, has_value, value = arg, "", ""
+
+        if name in ("-h", "--help"):
+            print(_HELP)
+            sys.exit(0)
+
+        if name in _FLAGS:
+            if has_value:
+                _usage_error(f"argument {name}: ignored explicit argument {value!r}")
+            args[_FLAGS[name]] = True
+            continue
+
+        if name not in _OPTIONS:
+            _usage_error(f"unrecognized arguments: {arg}")
+
+        key, convert = _OPTIONS[name]
+        if not has_value:
+            value = next(remaining, None)
+            if value is None:
+                _usage_error(f"argument {name}: expected one argument")
+        try:
+            args[key] = convert(value)
+        except ValueError:
+            _usage_error(f"argument {name}: invalid {convert.__name__} value: {value!r}")
+
+    return args
 
-    parser.add_argument(
-        "--registry-url",
-        type=str,
-        default=None,
-        help="ServiceAtlas 注册中心地址",
-    )
 
-    parser.add_argument(
-        "--no-registry",
-        action="store_true",
-        default=False,
-        help="禁用服务注册",
+def prepare_database() -> None:
+    """
+    多进程模式下在主进程中建表并初始化默认数据
+
+    每个工作进程都执行建表和"检查后插入"会相互冲突（表已存在、重复创建管理员），
+    因此在启动工作进程之前由主进程完成一次
+    """
+    from app.db.session import engine
+    from app.main import init_database
+
+    async def run() -> None:
+        try:
+            await init_database()
+        finally:
+            # 连接绑定在本事件循环上，工作进程会各自创建连接
+            await engine.dispose()
+
+    asyncio.run(run())
+
+
+def start_registry() -> Callable[[], None]:
+    """
+    多进程模式下在主进程的后台线程中注册服务并维持心跳
+
+    工作进程不注册服务，避免任一工作进程退出时注销整个服务
+
+    Returns:
+        停止函数：注销服务并等待后台线程结束
+    """
+    from app.core.registry import init_registry_client, shutdown_registry_client
+
+    stop_event = threading.Event()
+
+    async def run() -> None:
+        await init_registry_client()
+        try:
+            await asyncio.to_thread(stop_event.wait)
+        finally:
+            await shutdown_registry_client()
+
+    thread = threading.Thread(
+        target=asyncio.run, args=(run(),), name="aegis-registry", daemon=True
     )
+    thread.start()
+
+    def stop() -> None:
+        stop_event.set()
+        thread.join(timeout=10)
 
-    return parser.parse_args()
+    return stop
 
 
 def main():
     """主函数"""
-    args = parse_args()
+    args = parse_args(sys.argv[1:])
 
-    # 命令行参数覆盖环境变量
-    if args.port is not None:
-        os.environ["PORT"] = str(args.port)
+    # 命令行参数覆盖环境变量，收集后一次性写入
+    env_updates: Dict[str, str] = {}
 
-    if args.host is not None:
-        os.environ["HOST"] = args.host
+    if args["port"] is not None:
+        env_updates["PORT"] = str(args["port"])
 
-    if args.debug:
-        os.environ["DEBUG"] = "true"
+    if args["host"] is not None:
+        env_updates["HOST"] = args["host"]
 
-    if args.registry_url is not None:
-        os.environ["REGISTRY_URL"] = args.registry_url
+    if args["debug"]:
+        env_updates["DEBUG"] = "true"
 
-    if args.no_registry:
-        os.environ["REGISTRY_ENABLED"] = "false"
+    if args["workers"] is not None:
+        env_updates["WORKERS"] = str(args["workers"])
 
-    # 导入配置（在设置环境变量之后）
-    from app.core.config import get_settings
+    if args["registry_url"] is not None:
+        env_updates["REGISTRY_URL"] = args["registry_url"]
+
+    if args["no_registry"]:
+        env_updates["REGISTRY_ENABLED"] = "false"
 
-    # 清除缓存，重新加载配置
-    get_settings.cache_clear()
-    settings = get_settings()
+    os.environ.update(env_updates)
+
+    # 导入配置（在设置环境变量之后）
+    # 模块导入时已按上面的环境变量创建配置，应用在同一进程中复用这份配置，
+    # 无需清除缓存再创建一次（否则会重复读取配置并再次打印密钥提示）
+    from app.core.config import _AUTO_GENERATED_SECRET, settings
 
     # 确定是否启用热重载
-    reload_enabled = args.reload if args.reload is not None else settings.debug
+    reload_enabled = args["reload"] if args["reload"] is not None else settings.debug
+
+    # 访问日志只在调试模式开启，生产环境省去每个请求的日志格式化
+    access_log = settings.debug and not args["no_access_log"]
+
+    # 热重载与多进程互斥，热重载时只启动一个工作进程
+    workers = max(settings.workers, 1)
+    if reload_enabled and workers > 1:
+        print("热重载模式不支持多进程，仅启动 1 个工作进程")
+        workers = 1
+
+    # 每个工作进程会各自生成随机密钥，一个进程签发的令牌在其他进程验证失败
+    if workers > 1 and settings.jwt_secret_key == _AUTO_GENERATED_SECRET:
+        print("错误: 多进程模式必须通过 JWT_SECRET_KEY 配置固定的 JWT 密钥", file=sys.stderr)
+        sys.exit(1)
 
     print(f"启动 Aegis 服务...")
     print(f"  地址: {settings.host}:{settings.port}")
     print(f"  调试模式: {settings.debug}")
+    print(f"  工作进程: {workers}")
+    print(f"  访问日志: {access_log}")
     print(f"  服务注册: {settings.registry_enabled}")
     if settings.registry_enabled:
         print(f"  注册中心: {settings.registry_url}")
 
-    uvicorn.run(
-        "app.main:app",
-        host=settings.host,
-        port=settings.port,
-        reload=reload_enabled,
-        log_level="debug" if settings.debug else "info",
-    )
+    # 参数解析完成后再导入 uvicorn，--help 和参数错误时无需加载
+    import uvicorn
+
+    stop_registry = None
+    if workers > 1:
+        # 一次性的启动步骤由主进程完成，工作进程（重新导入配置）跳过
+        prepare_database()
+        os.environ["WORKER_PROCESS"] = "true"
+        if settings.registry_enabled:
+            stop_registry = start_registry()
+
+    try:
+        uvicorn.run(
+            "app.main:app",
+            host=settings.host,
+            port=settings.port,
+            reload=reload_enabled,
+            workers=workers,
+            log_level="debug" if settings.debug else "info",
+            access_log=access_log,
+            # 客户端 IP 由安全中间件自行从代理头解析，无需 uvicorn 再处理一遍
+            proxy_headers=False,
+            server_header=False,
+        )
+    finally:
+        if stop_registry is not None:
+            stop_registry()
 
 
 if __name__ == "__main__":